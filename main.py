@@ -1,7 +1,88 @@
 
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import quote
+import bisect
+import gzip
+import hashlib
+import heapq
+import lzma
 import os
+import shutil
+import sys
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+
+class ConsoleOutput:
+
+    def __init__(self, stream=None):
+        self._stream = stream if stream is not None else sys.stdout
+        self._buffer = []
+
+    def line(self, text=""):
+        self._buffer.append(text)
+
+    def message(self, text):
+        self._buffer.append(text)
+
+    def row(self, section, data, template):
+        self._buffer.append(template(data) if callable(template) else template.format(**data))
+
+    def flush(self):
+        if self._buffer:
+            self._stream.write("\n".join(self._buffer) + "\n")
+            self._stream.flush()
+            self._buffer = []
+
+
+class NullOutput:
+
+    def line(self, text=""):
+        pass
+
+    def message(self, text):
+        pass
+
+    def row(self, section, data, template):
+        pass
+
+    def flush(self):
+        pass
+
+
+class StructuredOutput:
+
+    def __init__(self):
+        self._messages = []
+        self._rows = {}
+
+    def line(self, text=""):
+        pass
+
+    def message(self, text):
+        self._messages.append(text)
+
+    def row(self, section, data, template):
+        self._rows.setdefault(section, []).append(data)
+
+    def flush(self):
+        pass
+
+    def get_messages(self):
+        return self._messages
+
+    def get_rows(self, section):
+        return self._rows.get(section, [])
+
+    def clear(self):
+        self._messages = []
+        self._rows = {}
 
 
 class User:
@@ -12,6 +93,9 @@ class User:
         self._role = role
         self._cart = []
         self._history = []
+        self._archived_count = 0
+        self._archive = None
+        self._output = ConsoleOutput()
 
     def get_username(self):
         return self._username
@@ -28,6 +112,20 @@ class User:
     def get_history(self):
         return self._history
 
+    def get_archived_count(self):
+        return self._archived_count
+
+    def set_archive(self, archive):
+        self._archive = archive
+
+    def set_output(self, output):
+        self._output = output
+
+    def iter_history(self):
+        if self._archive is not None:
+            yield from self._archive.iter_entries(self._username, self._archived_count)
+        yield from self._history
+
     def set_password(self, new_password):
         self._password = new_password
 
@@ -42,7 +140,8 @@ class User:
 
     def view_cart(self, sort_criteria=None):
         if not self._cart:
-            print("Корзина пуста.")
+            self._output.message("Корзина пуста.")
+            self._output.flush()
             return
 
         if sort_criteria:
@@ -52,13 +151,15 @@ class User:
 
         total_cost = sum(product.get_price() for product in self._cart)
 
-        print("-" * 30)
-        print("{:<20} {:<10}".format("Название", "Цена"))
-        print("-" * 30)
+        self._output.line("-" * 30)
+        self._output.line("{:<20} {:<10}".format("Название", "Цена"))
+        self._output.line("-" * 30)
         for product in sorted_cart:
-            print("{:<20} {:<10.2f}".format(product.get_name(), product.get_price()))
-        print("-" * 30)
-        print(f"Итоговая стоимость: {total_cost:.2f}")
+            self._output.row("cart", {"name": product.get_name(), "price": product.get_price()},
+                             "{name:<20} {price:<10.2f}")
+        self._output.line("-" * 30)
+        self._output.row("cart_total", {"total_cost": total_cost}, "Итоговая стоимость: {total_cost:.2f}")
+        self._output.flush()
 
     def sort_cart(self, sort_criteria):
         if sort_criteria == "price":
@@ -73,17 +174,24 @@ class User:
             return self._cart
 
     def view_purchase_history(self):
-        if not self._history:
-            print("История покупок пуста.")
-            return
-
-        print("\nИстория покупок:")
-        for i, purchase in enumerate(self._history):
-            print(f"--- Покупка {i + 1} ---")
-            print(f"Название: {purchase.get_name()}")
-            print(f"Цена: {purchase.get_price():.2f}")
-            print(f"Дата покупки: {purchase.get_purchase_date()}")
-            print("-" * 20)
+        count = 0
+        for count, purchase in enumerate(self.iter_history(), start=1):
+            if count == 1:
+                self._output.line("\nИстория покупок:")
+            self._output.row(
+                "history",
+                {"number": count, "name": purchase.get_name(), "price": purchase.get_price(),
+                 "purchase_date": purchase.get_purchase_date()},
+                "--- Покупка {number} ---\n"
+                "Название: {name}\n"
+                "Цена: {price:.2f}\n"
+                "Дата покупки: {purchase_date}\n"
+                "--------------------",
+            )
+
+        if count == 0:
+            self._output.message("История покупок пуста.")
+        self._output.flush()
 
     def __str__(self):
         return f"User(username='{self._username}', role='{self._role}')"
@@ -95,6 +203,7 @@ class User:
             "role": self._role,
             "cart": [p.to_dict() for p in self._cart],
             "history": [p.to_dict() for p in self._history],
+            "archived_count": self._archived_count,
         }
 
     @classmethod
@@ -125,6 +234,7 @@ class Admin(User):
         admin = cls(data['username'], data['password'])
         admin._cart = [Product.from_dict(p) for p in data['cart']]
         admin._history = [Product.from_dict(p) for p in data['history']]
+        admin._archived_count = data.get('archived_count', 0)
         return admin
 
 
@@ -137,23 +247,36 @@ class Customer(User):
         product_manager.show_products()
 
     def add_to_cart(self, product, product_manager):
-        if product.get_quantity() > 0:
+        if product.decrease_quantity(1):
             super().add_to_cart(product)
-            product.decrease_quantity(1)
-            print("Товар добавлен в корзину!")
+            self._output.message("Товар добавлен в корзину!")
         else:
-            print("Товар отсутствует на складе.")
+            self._output.message("Товар отсутствует на складе.")
+        self._output.flush()
 
-    def checkout(self):
+    def checkout(self, recommendations=None):
         self.view_cart()
         if input("Подтвердить покупку? (y/n): ").lower() == "y":
-            for product in self.get_cart():
-                product.set_purchase_date(datetime.now().isoformat())
-            self.add_to_history(self.get_cart())
+            purchase_date = datetime.now().isoformat()
+            self.add_to_history([Product(p.get_name(), p.get_price(), 1, purchase_date) for p in self.get_cart()])
+            if recommendations is not None:
+                recommendations.record_basket(p.get_name() for p in self.get_cart())
             self.clear_cart()
-            print("Покупка завершена!")
+            self._output.message("Покупка завершена!")
         else:
-            print("Покупка отменена.")
+            self._output.message("Покупка отменена.")
+        self._output.flush()
+
+    def view_recommendations(self, recommended):
+        if recommended:
+            self._output.row("recommendations", recommended,
+                             lambda names: f"\nЧасто покупают вместе: {', '.join(names)}")
+            self._output.flush()
+
+    def get_recent_product_names(self, limit=10):
+        names = [p.get_name() for p in self._cart]
+        names.extend(p.get_name() for p in reversed(self._history[-limit:]))
+        return names
 
     def __str__(self):
         return f"Customer(username='{self._username}')"
@@ -163,6 +286,7 @@ class Customer(User):
         customer = cls(data['username'], data['password'])
         customer._cart = [Product.from_dict(p) for p in data['cart']]
         customer._history = [Product.from_dict(p) for p in data['history']]
+        customer._archived_count = data.get('archived_count', 0)
         return customer
 
 
@@ -186,8 +310,8 @@ class Product:
     def set_price(self, new_price):
         if new_price > 0:
             self._price = new_price
-        else:
-            print("Цена должна быть больше 0.")
+            return True
+        return False
 
     def get_quantity(self):
         return self._quantity
@@ -195,14 +319,14 @@ class Product:
     def set_quantity(self, new_quantity):
         if new_quantity >= 0:
             self._quantity = new_quantity
-        else:
-            print("Количество не может быть отрицательным.")
+            return True
+        return False
 
     def decrease_quantity(self, amount):
         if amount > 0 and self._quantity >= amount:
             self._quantity -= amount
-        else:
-            print("Недостаточно товара на складе.")
+            return True
+        return False
 
     def get_purchase_date(self):
         return self._purchase_date
@@ -226,23 +350,109 @@ class Product:
         return cls(data['name'], data['price'], data['quantity'], data.get('purchase_date'))
 
 
+class RecommendationEngine:
+
+    def __init__(self, top_k=5):
+        self._top_k = top_k
+        self._pairs = {}
+        self._top = {}
+
+    def build(self, users):
+        self._pairs = {}
+        baskets = self._collect_baskets(users)
+        if sparse is not None:
+            self._build_sparse(baskets)
+        else:
+            for basket in baskets:
+                self._add_basket(basket)
+        self._top = {name: self._rank(name) for name in self._pairs}
+
+    def record_basket(self, names):
+        basket = set(names)
+        self._add_basket(basket)
+        for name in basket:
+            self._top[name] = self._rank(name)
+
+    def related(self, name):
+        return self._top.get(name, [])
+
+    def recommend(self, names, limit=None):
+        seen = set(names)
+        result = []
+        for name in names:
+            for other in self._top.get(name, ()):
+                if other not in seen:
+                    seen.add(other)
+                    result.append(other)
+        return result[:limit or self._top_k]
+
+    @staticmethod
+    def _collect_baskets(users):
+        baskets = {}
+        for username, user in users.items():
+            for purchase in user.iter_history():
+                purchase_date = purchase.get_purchase_date()
+                if purchase_date is None:
+                    continue
+                baskets.setdefault((username, purchase_date), set()).add(purchase.get_name())
+        return list(baskets.values())
+
+    def _add_basket(self, basket):
+        for name in basket:
+            row = self._pairs.setdefault(name, {})
+            for other in basket:
+                if other != name:
+                    row[other] = row.get(other, 0) + 1
+
+    def _build_sparse(self, baskets):
+        index = {}
+        rows = []
+        cols = []
+        for basket_id, basket in enumerate(baskets):
+            for name in basket:
+                rows.append(basket_id)
+                cols.append(index.setdefault(name, len(index)))
+        if not rows:
+            return
+
+        names = list(index)
+        incidence = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(baskets), len(names)),
+        )
+        co_occurrence = (incidence.T @ incidence).tocoo()
+        mask = co_occurrence.row != co_occurrence.col
+        for i, j, count in zip(co_occurrence.row[mask].tolist(),
+                               co_occurrence.col[mask].tolist(),
+                               co_occurrence.data[mask].tolist()):
+            self._pairs.setdefault(names[i], {})[names[j]] = count
+
+    def _rank(self, name):
+        row = self._pairs.get(name, {})
+        return [other for other, count in heapq.nsmallest(self._top_k, row.items(), key=lambda x: (-x[1], x[0]))]
+
+
 class ProductManager:
 
-    def __init__(self, products_data=None, data_file="products.json"):
+    def __init__(self, products_data=None, data_file="products.json", output=None):
         self._products = []
         self._data_file = data_file
+        self._output = output if output is not None else ConsoleOutput()
         self.load_data()
+        self._output.flush()
 
     def add_product(self, name, price, quantity):
         product = Product(name, price, quantity)
         self._products.append(product)
         self.save_data()
-        print("Товар добавлен!")
+        self._output.message("Товар добавлен!")
+        self._output.flush()
 
     def delete_product(self, name):
         self._products[:] = [p for p in self._products if p.get_name() != name]
         self.save_data()
-        print(f"Товар '{name}' удален.")
+        self._output.message(f"Товар '{name}' удален.")
+        self._output.flush()
 
     def edit_product(self, index, new_name, new_price, new_quantity):
         if 0 <= index < len(self._products):
@@ -252,33 +462,43 @@ class ProductManager:
             if new_price:
                 try:
                     new_price = float(new_price)
-                    product.set_price(new_price)
+                    if not product.set_price(new_price):
+                        self._output.message("Цена должна быть больше 0.")
                 except ValueError:
-                    print("Неверный формат цены.")
+                    self._output.message("Неверный формат цены.")
             if new_quantity:
                 try:
                     new_quantity = int(new_quantity)
-                    product.set_quantity(new_quantity)
+                    if not product.set_quantity(new_quantity):
+                        self._output.message("Количество не может быть отрицательным.")
                 except ValueError:
-                    print("Неверный формат количества.")
+                    self._output.message("Неверный формат количества.")
             self.save_data()
-            print("Товар успешно отредактирован.")
+            self._output.message("Товар успешно отредактирован.")
         else:
-            print("Неверный номер товара.")
+            self._output.message("Неверный номер товара.")
+        self._output.flush()
 
     def show_products(self, sorted_products=None):
         if not self._products:
-            print("Товаров нет в наличии.")
+            self._output.message("Товаров нет в наличии.")
+            self._output.flush()
             return
 
         products_to_display = sorted_products if sorted_products is not None else self._products
 
-        print("-" * 30)
-        print("{:<20} {:<10} {:<10}".format("Название", "Цена", "Количество"))
-        print("-" * 30)
+        self._output.line("-" * 30)
+        self._output.line("{:<20} {:<10} {:<10}".format("Название", "Цена", "Количество"))
+        self._output.line("-" * 30)
         for i, product in enumerate(products_to_display):
-            print(f"{i + 1}. {product.get_name():<20} {product.get_price():<10.2f} {product.get_quantity():<10}")
-        print("-" * 30)
+            self._output.row(
+                "products",
+                {"number": i + 1, "name": product.get_name(), "price": product.get_price(),
+                 "quantity": product.get_quantity()},
+                "{number}. {name:<20} {price:<10.2f} {quantity:<10}",
+            )
+        self._output.line("-" * 30)
+        self._output.flush()
 
     def sort_products(self, sort_criteria):
         if sort_criteria == "price":
@@ -360,17 +580,17 @@ class ProductManager:
             with open(file_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 self._products = [Product.from_dict(p) for p in data] 
-            print("Данные о товарах загружены.")
+            self._output.message("Данные о товарах загружены.")
         except FileNotFoundError:
-            print("Файл с данными о товарах не найден. Создан новый.")
+            self._output.message("Файл с данными о товарах не найден. Создан новый.")
             self._products = []
             self.save_data()
         except json.JSONDecodeError:
-            print("Ошибка декодирования JSON. Файл поврежден или пуст.")
+            self._output.message("Ошибка декодирования JSON. Файл поврежден или пуст.")
             self._products = []
             self.save_data()
         except Exception as e:
-            print(f"Произошла ошибка при загрузке данных о товарах: {e}")
+            self._output.message(f"Произошла ошибка при загрузке данных о товарах: {e}")
 
     def save_data(self):
         try:
@@ -379,21 +599,211 @@ class ProductManager:
             data = [p.to_dict() for p in self._products]
             with open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=4, ensure_ascii=False)
-            print("Данные о товарах сохранены.")
+            self._output.message("Данные о товарах сохранены.")
         except Exception as e:
-            print(f"Произошла ошибка при сохранении данных о товарах: {e}")
+            self._output.message(f"Произошла ошибка при сохранении данных о товарах: {e}")
+
+
+class HistoryArchive:
+
+    COMPRESSORS = {
+        "gzip": (gzip.open, ".jsonl.gz"),
+        "lzma": (lzma.open, ".jsonl.xz"),
+    }
+    PENDING_FILE = "pending.jsonl"
+
+    def __init__(self, archive_dir="history_archive", max_hot_entries=100, max_age_days=365, compression="gzip"):
+        if compression not in self.COMPRESSORS:
+            raise ValueError(f"Неизвестный формат сжатия: {compression}")
+        self._archive_dir = archive_dir
+        self._max_hot_entries = max_hot_entries
+        self._max_age_days = max_age_days
+        self._compression = compression
+
+    def archive(self, user):
+        history = user.get_history()
+        cutoff = (datetime.now() - timedelta(days=self._max_age_days)).isoformat()
+        split = max(0, len(history) - self._max_hot_entries)
+        while split < len(history) and self._is_older(history[split], cutoff):
+            split += 1
+        if split == 0:
+            return 0
+
+        user_dir = self._user_dir(user.get_username())
+        os.makedirs(user_dir, exist_ok=True)
+        with open(os.path.join(user_dir, self.PENDING_FILE), 'a', encoding='utf-8') as f:
+            for seq, purchase in enumerate(history[:split], start=user.get_archived_count()):
+                f.write(json.dumps(dict(purchase.to_dict(), seq=seq), ensure_ascii=False) + "\n")
+
+        user._history = history[split:]
+        user._archived_count += split
+        return split
+
+    def commit(self, user):
+        pending_path = os.path.join(self._user_dir(user.get_username()), self.PENDING_FILE)
+        if not os.path.exists(pending_path):
+            return
+
+        segments = {}
+        for entry in self._read_pending(pending_path, user.get_archived_count()):
+            segments.setdefault(self._segment_name(entry.get('purchase_date')), []).append(entry)
+
+        opener, extension = self.COMPRESSORS[self._compression]
+        for segment, entries in segments.items():
+            path = os.path.join(os.path.dirname(pending_path), segment + extension)
+            with opener(path, 'at', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        os.remove(pending_path)
+
+    def iter_entries(self, username, archived_count):
+        user_dir = self._user_dir(username)
+        if not os.path.isdir(user_dir):
+            return
+
+        streams = []
+        for file_name in sorted(os.listdir(user_dir)):
+            for opener, extension in self.COMPRESSORS.values():
+                if file_name.endswith(extension):
+                    streams.append(self._read_segment(opener, os.path.join(user_dir, file_name)))
+                    break
+
+        pending_path = os.path.join(user_dir, self.PENDING_FILE)
+        if os.path.exists(pending_path):
+            streams.append(self._read_pending(pending_path, archived_count))
+
+        last_seq = -1
+        for entry in heapq.merge(*streams, key=lambda entry: entry['seq']):
+            if entry['seq'] > last_seq:
+                last_seq = entry.pop('seq')
+                yield Product.from_dict(entry)
+
+    def delete(self, username):
+        shutil.rmtree(self._user_dir(username), ignore_errors=True)
+
+    def _user_dir(self, username):
+        root = os.path.realpath(os.path.join(os.path.dirname(__file__), self._archive_dir))
+        digest = hashlib.sha256(username.encode('utf-8')).hexdigest()
+        user_dir = os.path.realpath(os.path.join(root, f"user-{quote(username[:16], safe='')}-{digest}"))
+        if user_dir == root or os.path.commonpath([root, user_dir]) != root:
+            raise ValueError(f"Недопустимый путь архива для пользователя: {username!r}")
+        return user_dir
+
+    @staticmethod
+    def _is_older(purchase, cutoff):
+        purchase_date = purchase.get_purchase_date()
+        return purchase_date is None or purchase_date < cutoff
+
+    @staticmethod
+    def _read_segment(opener, path):
+        last_seq = -1
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['seq'] > last_seq:
+                    last_seq = entry['seq']
+                    yield entry
+
+    @staticmethod
+    def _read_pending(pending_path, archived_count):
+        last_seq = -1
+        with open(pending_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if last_seq < entry['seq'] < archived_count:
+                    last_seq = entry['seq']
+                    yield entry
+
+    @staticmethod
+    def _segment_name(purchase_date):
+        return purchase_date[:7] if purchase_date else "0000-00"
+
+
+class UserDirectory:
+
+    def __init__(self):
+        self._usernames = []
+        self._by_role = {}
+        self._roles = {}
+
+    def add(self, username, role):
+        if username in self._roles:
+            self.remove(username)
+        bisect.insort(self._usernames, username)
+        bisect.insort(self._by_role.setdefault(role, []), username)
+        self._roles[username] = role
+
+    def remove(self, username):
+        role = self._roles.pop(username, None)
+        if role is None:
+            return
+        self._discard(self._usernames, username)
+        self._discard(self._by_role[role], username)
+
+    def change_role(self, username, new_role):
+        self.add(username, new_role)
+
+    def count(self, role=None):
+        if role is None:
+            return len(self._usernames)
+        return len(self._by_role.get(role, []))
+
+    def role_counts(self):
+        return {role: len(names) for role, names in self._by_role.items() if names}
+
+    def get_role(self, username):
+        return self._roles.get(username)
+
+    def page(self, page_number, page_size, role=None):
+        names = self._names(role)
+        start = (page_number - 1) * page_size
+        return names[start:start + page_size]
+
+    def page_count(self, page_size, role=None):
+        return max(1, -(-self.count(role) // page_size))
+
+    def search(self, prefix, role=None, limit=None):
+        names = self._names(role)
+        result = []
+        for i in range(bisect.bisect_left(names, prefix), len(names)):
+            if not names[i].startswith(prefix) or (limit is not None and len(result) >= limit):
+                break
+            result.append(names[i])
+        return result
+
+    def _names(self, role):
+        if role is None:
+            return self._usernames
+        return self._by_role.get(role, [])
+
+    @staticmethod
+    def _discard(names, username):
+        i = bisect.bisect_left(names, username)
+        if i < len(names) and names[i] == username:
+            del names[i]
 
 
 class UserManager:
 
-    def __init__(self, data_file="users.json"):
+    def __init__(self, data_file="users.json", archive=None, output=None):
         self._users = {}
         self._data_file = data_file
+        self._output = output if output is not None else ConsoleOutput()
+        self._archive = archive if archive is not None else HistoryArchive()
+        self._recommendations = RecommendationEngine()
+        self._directory = UserDirectory()
         self.load_data()
+        for username, user in self._users.items():
+            self._directory.add(username, user.get_role())
+        self._commit_archives()
+        if self.archive_history():
+            self.save_data()
+        self._recommendations.build(self._users)
+        self._output.flush()
 
     def register_user(self, username, password, role):
         if username in self._users:
-            print("Пользователь с таким именем уже существует. Выберите другое имя.")
+            self._output.message("Пользователь с таким именем уже существует. Выберите другое имя.")
+            self._output.flush()
             return
 
         if role == "admin":
@@ -401,28 +811,36 @@ class UserManager:
         elif role == "user":
             user = Customer(username, password)
         else:
-            print("Неверная роль.")
+            self._output.message("Неверная роль.")
+            self._output.flush()
             return
 
+        self._attach(user)
         self._users[username] = user
+        self._directory.add(username, role)
         self.save_data()
-        print("Регистрация прошла успешно!")
+        self._output.message("Регистрация прошла успешно!")
+        self._output.flush()
 
     def login(self, username, password):
         user = self._users.get(username)
         if user and user.get_password() == password:
             return user
         else:
-            print("Неверный логин или пароль. Пожалуйста, проверьте введенные данные.")
+            self._output.message("Неверный логин или пароль. Пожалуйста, проверьте введенные данные.")
+            self._output.flush()
             return None
 
     def delete_user(self, username):
         if username in self._users:
             del self._users[username]
+            self._directory.remove(username)
+            self._archive.delete(username)
             self.save_data()
-            print(f"Пользователь {username} удален.")
+            self._output.message(f"Пользователь {username} удален.")
         else:
-            print("Пользователь не найден.")
+            self._output.message("Пользователь не найден.")
+        self._output.flush()
 
     def change_user_role(self, username, new_role):
         user = self._users.get(username)
@@ -435,36 +853,82 @@ class UserManager:
 
                 new_user._cart = user.get_cart()
                 new_user._history = user.get_history()
+                new_user._archived_count = user.get_archived_count()
+                self._attach(new_user)
 
                 self._users[username] = new_user
+                self._directory.change_role(username, new_role)
                 self.save_data()
-                print(f"Роль пользователя {username} изменена на {new_role}.")
+                self._output.message(f"Роль пользователя {username} изменена на {new_role}.")
             else:
-                print("Неверная роль. Введите 'user' или 'admin'.")
+                self._output.message("Неверная роль. Введите 'user' или 'admin'.")
         else:
-            print("Пользователь не найден.")
+            self._output.message("Пользователь не найден.")
+        self._output.flush()
 
     def change_user_password(self, username, new_password):
         user = self._users.get(username)
         if user:
             user.set_password(new_password)
             self.save_data()
-            print(f"Пароль пользователя {username} успешно изменен.")
+            self._output.message(f"Пароль пользователя {username} успешно изменен.")
         else:
-            print("Пользователь не найден.")
+            self._output.message("Пользователь не найден.")
+        self._output.flush()
 
-    def list_users(self):
+    def list_users(self, page=1, page_size=10, role=None):
         if not self._users:
-            print("Нет зарегистрированных пользователей.")
+            self._output.message("Нет зарегистрированных пользователей.")
+            self._output.flush()
+            return
+
+        page_count = self._directory.page_count(page_size, role)
+        page = min(max(page, 1), page_count)
+        usernames = self._directory.page(page, page_size, role)
+        if not usernames:
+            self._output.message("Пользователи не найдены.")
+            self.show_role_counts()
+            return
+
+        self._output.line("\nСписок пользователей:")
+        for i, username in enumerate(usernames, start=(page - 1) * page_size + 1):
+            self._user_row("users", i, username)
+        self._output.row("users_page", {"page": page, "page_count": page_count}, "Страница {page} из {page_count}")
+        self.show_role_counts()
+
+    def search_users(self, prefix, role=None, limit=20):
+        usernames = self._directory.search(prefix, role, limit)
+        if not usernames:
+            self._output.message("Пользователи не найдены.")
+            self._output.flush()
             return
 
-        print("\nСписок пользователей:")
-        for i, (username, user) in enumerate(self._users.items()):
-            print(f"{i + 1}. Имя пользователя: {username}, Роль: {user.get_role()}")
+        self._output.line("\nРезультаты поиска:")
+        for i, username in enumerate(usernames):
+            self._user_row("user_search", i + 1, username)
+        self._output.flush()
+
+    def show_role_counts(self):
+        self._output.row(
+            "role_counts",
+            {"total": self._directory.count(), "roles": self._directory.role_counts()},
+            lambda data: "Всего пользователей: {} ({})".format(
+                data["total"], ", ".join(f"{role}: {count}" for role, count in sorted(data["roles"].items()))),
+        )
+        self._output.flush()
+
+    def _user_row(self, section, number, username):
+        role = self._directory.get_role(username)
+        self._output.row(section, {"number": number, "username": username, "role": role},
+                         "{number}. Имя пользователя: {username}, Роль: {role}")
 
     def manage_users(self):
+        page = 1
+        page_size = 10
+        role_filter = None
         while True:
-            self.list_users()
+            page = min(max(page, 1), self._directory.page_count(page_size, role_filter))
+            self.list_users(page, page_size, role_filter)
 
             print("\nВыберите действие: ")
             print("1 - добавить пользователя")
@@ -472,6 +936,10 @@ class UserManager:
             print("3 - изменить пароль пользователя")
             print("4 - удалить пользователя")
             print("5 - назад")
+            print("6 - следующая страница")
+            print("7 - предыдущая страница")
+            print("8 - поиск пользователя")
+            print("9 - фильтр по роли")
             action = input()
             try:
                 if action == '1':
@@ -509,6 +977,21 @@ class UserManager:
                     self.delete_user(username)
                 elif action == '5':
                     break
+                elif action == '6':
+                    page += 1
+                elif action == '7':
+                    page -= 1
+                elif action == '8':
+                    prefix = input("Введите начало имени пользователя: ")
+                    self.search_users(prefix, role_filter)
+                    input("Нажмите Enter, чтобы продолжить...")
+                elif action == '9':
+                    role = input("Введите роль (user/admin, пусто - все): ").lower()
+                    if role in ["user", "admin", ""]:
+                        role_filter = role or None
+                        page = 1
+                    else:
+                        print("Неверная роль. Введите 'user' или 'admin'.")
                 else:
                     print("Неверный выбор.")
             except Exception as e:
@@ -518,22 +1001,51 @@ class UserManager:
         total_purchases = 0
         total_revenue = 0
         for username, user in self._users.items():
-            for purchase in user.get_history():
+            for purchase in user.iter_history():
                 total_purchases += 1
                 total_revenue += purchase.get_price()
 
         if total_purchases > 0:
             average_purchase_value = total_revenue / total_purchases
-            print(f"\nСтатистика:")
-            print(f"Общее количество покупок: {total_purchases}")
-            print(f"Общая выручка: {total_revenue:.2f}")
-            print(f"Средняя стоимость покупки: {average_purchase_value:.2f}")
+            self._output.row(
+                "statistics",
+                {"total_purchases": total_purchases, "total_revenue": total_revenue,
+                 "average_purchase_value": average_purchase_value},
+                "\nСтатистика:\n"
+                "Общее количество покупок: {total_purchases}\n"
+                "Общая выручка: {total_revenue:.2f}\n"
+                "Средняя стоимость покупки: {average_purchase_value:.2f}",
+            )
         else:
-            print("\nСтатистика пока недоступна (нет покупок).")
+            self._output.message("\nСтатистика пока недоступна (нет покупок).")
+        self._output.flush()
 
     def get_users(self):
         return self._users  
 
+    def get_recommendations(self):
+        return self._recommendations
+
+    def _attach(self, user):
+        user.set_archive(self._archive)
+        user.set_output(self._output)
+
+    def archive_history(self):
+        archived = 0
+        for username, user in self._users.items():
+            try:
+                archived += self._archive.archive(user)
+            except Exception as e:
+                self._output.message(f"Не удалось архивировать историю пользователя {username}: {e}")
+        return archived
+
+    def _commit_archives(self):
+        for username, user in self._users.items():
+            try:
+                self._archive.commit(user)
+            except Exception as e:
+                self._output.message(f"Не удалось перенести историю пользователя {username} в архив: {e}")
+
     def load_data(self):
         try:
             file_path = os.path.join(os.path.dirname(__file__), self._data_file)
@@ -546,35 +1058,45 @@ class UserManager:
                         self._users[username] = Admin.from_dict(user_data)
                     else:
                         self._users[username] = Customer.from_dict(user_data)
-            print("Данные о пользователях загружены.")
+                    self._attach(self._users[username])
+            self._output.message("Данные о пользователях загружены.")
         except FileNotFoundError:
-            print("Файл с данными о пользователях не найден. Создан новый.")
+            self._output.message("Файл с данными о пользователях не найден. Создан новый.")
             self._users = {}
             self.save_data() 
         except json.JSONDecodeError:
-            print("Ошибка декодирования JSON. Файл поврежден или пуст.")
+            self._output.message("Ошибка декодирования JSON. Файл поврежден или пуст.")
             self._users = {} 
             self.save_data() 
         except Exception as e:
-            print(f"Произошла ошибка при загрузке данных о пользователях: {e}")
+            self._output.message(f"Произошла ошибка при загрузке данных о пользователях: {e}")
 
     def save_data(self):
         try:
             file_path = os.path.join(os.path.dirname(__file__), self._data_file)
 
+            self.archive_history()
             data = {username: user.to_dict() for username, user in self._users.items()}
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-            print("Данные о пользователях сохранены.")
+            tmp_path = file_path + ".tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=4, ensure_ascii=False)
+                os.replace(tmp_path, file_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._output.message("Данные о пользователях сохранены.")
+            self._commit_archives()
         except Exception as e:
-            print(f"Произошла ошибка при сохранении данных о пользователях: {e}")
+            self._output.message(f"Произошла ошибка при сохранении данных о пользователях: {e}")
 
 
 # --- Main ---
 
 def main():
-    user_manager = UserManager()
-    product_manager = ProductManager()
+    output = ConsoleOutput()
+    user_manager = UserManager(output=output)
+    product_manager = ProductManager(output=output)
 
     while True:
         print("\nМеню:")
@@ -608,7 +1130,7 @@ def main():
                     if isinstance(user, Admin):
                         admin_menu(user, user_manager, product_manager)
                     elif isinstance(user, Customer):
-                        user_menu(user, product_manager)
+                        user_menu(user, product_manager, user_manager.get_recommendations())
             elif choice == "3":
                 break
             else:
@@ -644,7 +1166,7 @@ def admin_menu(admin, user_manager, product_manager):
             print(f"Произошла ошибка в меню администратора: {e}")
 
 
-def user_menu(customer, product_manager):
+def user_menu(customer, product_manager, recommendations):
     while True:
         print("\nМеню пользователя:")
         print("1. Просмотреть товары")
@@ -689,6 +1211,7 @@ def user_menu(customer, product_manager):
                     sorted_products = product_manager.get_products()
 
                 product_manager.show_products(sorted_products)
+                customer.view_recommendations(recommendations.recommend(customer.get_recent_product_names()))
 
             elif choice == "2":
                 product_manager.show_products()
@@ -727,8 +1250,9 @@ def user_menu(customer, product_manager):
                     customer.view_cart("name_desc")
                 else:
                     customer.view_cart()
+                customer.view_recommendations(recommendations.recommend([p.get_name() for p in customer.get_cart()]))
             elif choice == "4":
-                customer.checkout()
+                customer.checkout(recommendations)
             elif choice == "5":
                 customer.view_purchase_history()
             elif choice == "6":
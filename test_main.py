@@ -0,0 +1,384 @@
+import io
+import os
+from datetime import datetime
+
+import pytest
+
+import main
+from main import (
+    ConsoleOutput,
+    Customer,
+    HistoryArchive,
+    NullOutput,
+    Product,
+    ProductManager,
+    RecommendationEngine,
+    StructuredOutput,
+    UserDirectory,
+    UserManager,
+)
+
+
+def reload(user_manager):
+    return UserManager(data_file=user_manager._data_file, archive=user_manager._archive, output=NullOutput())
+
+
+def make_customer(username, baskets):
+    customer = Customer(username, "password")
+    for purchase_date, names in baskets:
+        customer.add_to_history([Product(name, 10.0, 1, purchase_date) for name in names])
+    return customer
+
+
+@pytest.fixture
+def output():
+    return StructuredOutput()
+
+
+@pytest.fixture
+def user_manager(tmp_path, output):
+    archive = HistoryArchive(archive_dir=str(tmp_path / "archive"), max_hot_entries=2)
+    return UserManager(data_file=str(tmp_path / "users.json"), archive=archive, output=output)
+
+
+@pytest.fixture
+def users():
+    return {
+        "anna": make_customer("anna", [
+            ("2026-01-01T10:00:00", ["milk", "bread", "butter"]),
+            ("2026-01-02T10:00:00", ["milk", "bread"]),
+        ]),
+        "oleg": make_customer("oleg", [
+            ("2026-01-01T10:00:00", ["milk", "cheese"]),
+            (None, ["milk", "tea"]),
+        ]),
+    }
+
+
+def test_build_groups_history_by_checkout(users):
+    engine = RecommendationEngine()
+    engine.build(users)
+
+    assert engine.related("milk") == ["bread", "butter", "cheese"]
+    assert engine.related("bread") == ["milk", "butter"]
+    assert engine.related("tea") == []
+
+
+def test_recommend_skips_seed_products(users):
+    engine = RecommendationEngine(top_k=2)
+    engine.build(users)
+
+    assert engine.recommend(["milk", "bread"]) == ["butter"]
+    assert engine.recommend(["cheese", "bread"]) == ["milk", "butter"]
+    assert engine.recommend(["unknown"]) == []
+
+
+def test_record_basket_matches_full_rebuild(users):
+    incremental = RecommendationEngine()
+    incremental.build(users)
+    basket = ["cheese", "bread", "tea"]
+    incremental.record_basket(basket)
+
+    users["oleg"].add_to_history([Product(name, 10.0, 1, "2026-01-03T10:00:00") for name in basket])
+    rebuilt = RecommendationEngine()
+    rebuilt.build(users)
+
+    for name in ["milk", "bread", "butter", "cheese", "tea"]:
+        assert incremental.related(name) == rebuilt.related(name)
+
+
+def test_repeat_purchase_keeps_earlier_checkout(monkeypatch):
+    milk, bread, tea = Product("milk", 10.0, 5), Product("bread", 20.0, 5), Product("tea", 30.0, 5)
+    customer = Customer("anna", "password")
+    customer.set_output(NullOutput())
+    engine = RecommendationEngine()
+    monkeypatch.setattr("builtins.input", lambda prompt="": "y")
+    checkout_times = iter([datetime(2026, 1, 1, 10), datetime(2026, 1, 2, 10)])
+
+    class FakeDatetime:
+        @staticmethod
+        def now():
+            return next(checkout_times)
+
+    monkeypatch.setattr(main, "datetime", FakeDatetime)
+
+    for basket in ([milk, bread], [milk, tea]):
+        for product in basket:
+            customer.add_to_cart(product, None)
+        customer.checkout(engine)
+
+    rebuilt = RecommendationEngine()
+    rebuilt.build({"anna": customer})
+    assert milk.get_purchase_date() is None
+    assert rebuilt.related("milk") == engine.related("milk") == ["bread", "tea"]
+    assert rebuilt.related("bread") == ["milk"]
+
+
+@pytest.fixture
+def directory():
+    directory = UserDirectory()
+    for username in ["boris", "anna", "bob", "alex", "bella"]:
+        directory.add(username, "user")
+    directory.add("admin", "admin")
+    return directory
+
+
+def test_directory_prefix_search(directory):
+    assert directory.search("b") == ["bella", "bob", "boris"]
+    assert directory.search("bo") == ["bob", "boris"]
+    assert directory.search("b", limit=2) == ["bella", "bob"]
+    assert directory.search("a", role="admin") == ["admin"]
+    assert directory.search("z") == []
+
+
+def test_directory_pages_and_counts(directory):
+    assert directory.page(1, 4) == ["admin", "alex", "anna", "bella"]
+    assert directory.page(2, 4) == ["bob", "boris"]
+    assert directory.page(2, 4, role="user") == ["boris"]
+    assert directory.page_count(4) == 2
+    assert directory.page_count(4, role="missing") == 1
+    assert directory.role_counts() == {"user": 5, "admin": 1}
+
+
+def test_directory_tracks_role_changes_and_removal(directory):
+    directory.change_role("bob", "admin")
+    directory.remove("admin")
+    directory.remove("nobody")
+
+    assert directory.search("", role="admin") == ["bob"]
+    assert directory.get_role("bob") == "admin"
+    assert directory.count() == 5
+
+    directory.remove("bob")
+    assert directory.role_counts() == {"user": 4}
+
+
+def test_list_users_clamps_page(user_manager, output):
+    for i in range(12):
+        user_manager.register_user(f"user{i:02d}", "password", "user")
+    output.clear()
+
+    user_manager.list_users(page=99, page_size=5)
+
+    assert [row["username"] for row in output.get_rows("users")] == ["user10", "user11"]
+    assert output.get_rows("users_page") == [{"page": 3, "page_count": 3}]
+
+
+def test_list_users_reports_empty_role_filter(user_manager, output):
+    user_manager.register_user("anna", "password", "user")
+    output.clear()
+
+    user_manager.list_users(role="admin")
+
+    assert output.get_rows("users") == []
+    assert "Пользователи не найдены." in output.get_messages()
+    assert output.get_rows("role_counts") == [{"total": 1, "roles": {"user": 1}}]
+
+
+def add_purchases(user_manager, username, dates):
+    user = user_manager.get_users()[username]
+    user.add_to_history([Product(f"item{i}", 10.0, 1, date) for i, date in enumerate(dates)])
+    return user
+
+
+def names(user):
+    return [purchase.get_name() for purchase in user.iter_history()]
+
+
+def test_archive_round_trip(user_manager):
+    user_manager.register_user("anna", "password", "user")
+    user = add_purchases(user_manager, "anna", [f"2026-0{i + 1}-01T10:00:00" for i in range(5)])
+
+    user_manager.save_data()
+
+    assert [p.get_name() for p in user.get_history()] == ["item3", "item4"]
+    assert user.get_archived_count() == 3
+    assert names(user) == ["item0", "item1", "item2", "item3", "item4"]
+    assert names(reload(user_manager).get_users()["anna"]) == names(user)
+
+
+def test_archive_moves_entries_past_age(tmp_path):
+    archive = HistoryArchive(archive_dir=str(tmp_path / "archive"), max_hot_entries=100, max_age_days=30)
+    user = make_customer("anna", [
+        ("2020-01-01T10:00:00", ["old"]),
+        (datetime.now().isoformat(), ["new"]),
+    ])
+    user.set_archive(archive)
+
+    assert archive.archive(user) == 1
+    archive.commit(user)
+
+    assert [p.get_name() for p in user.get_history()] == ["new"]
+    assert names(user) == ["old", "new"]
+
+
+@pytest.mark.parametrize("dates", [
+    [None, "2026-01-01T10:00:00", "2026-02-01T10:00:00", None, "2026-03-01T10:00:00"],
+    ["2026-01-01T10:00:00", None, "2026-02-01T10:00:00", "2026-01-15T10:00:00", "2026-03-01T10:00:00"],
+])
+def test_archive_keeps_purchase_order(user_manager, dates):
+    user_manager.register_user("anna", "password", "user")
+    user = add_purchases(user_manager, "anna", dates)
+
+    user_manager.save_data()
+
+    assert names(user) == ["item0", "item1", "item2", "item3", "item4"]
+    assert names(reload(user_manager).get_users()["anna"]) == names(user)
+
+
+def test_failed_save_does_not_duplicate_history(user_manager, monkeypatch):
+    user_manager.register_user("anna", "password", "user")
+    add_purchases(user_manager, "anna", [f"2026-01-0{i + 1}T10:00:00" for i in range(4)])
+    user_manager.save_data()
+
+    add_purchases(user_manager, "anna", [f"2026-02-0{i + 1}T10:00:00" for i in range(3)])
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(main.os, "replace", fail_replace)
+        user_manager.save_data()
+
+    assert not os.path.exists(user_manager._data_file + ".tmp")
+    restarted = reload(user_manager)
+    user = restarted.get_users()["anna"]
+    assert names(user) == ["item0", "item1", "item2", "item3"]
+
+    add_purchases(restarted, "anna", ["2026-03-01T10:00:00"])
+    restarted.save_data()
+    assert names(reload(restarted).get_users()["anna"]) == ["item0", "item1", "item2", "item3", "item0"]
+
+
+def test_archive_handles_long_usernames(user_manager, tmp_path):
+    username = "пользователь" * 4
+    user_manager.register_user(username, "password", "user")
+    add_purchases(user_manager, username, [f"2026-01-0{i + 1}T10:00:00" for i in range(3)])
+
+    user_manager.save_data()
+
+    assert user_manager.get_users()[username].get_archived_count() == 1
+    assert all(len(name.encode("utf-8")) < 255 for name in os.listdir(tmp_path / "archive"))
+    assert names(reload(user_manager).get_users()[username]) == ["item0", "item1", "item2"]
+
+
+def test_archive_failure_does_not_block_save(user_manager, output, monkeypatch):
+    archive = user_manager._archive
+    original_archive = type(archive).archive
+
+    def archive_or_fail(self, user):
+        if user.get_username() == "broken":
+            raise OSError("archive unavailable")
+        return original_archive(self, user)
+
+    monkeypatch.setattr(HistoryArchive, "archive", archive_or_fail)
+    user_manager.register_user("broken", "password", "user")
+    add_purchases(user_manager, "broken", [f"2026-01-0{i + 1}T10:00:00" for i in range(3)])
+    user_manager.register_user("bob", "password", "user")
+
+    restarted = reload(user_manager).get_users()
+    assert "bob" in restarted
+    assert [p.get_name() for p in restarted["broken"].get_history()] == ["item0", "item1", "item2"]
+    assert any("broken" in message for message in output.get_messages())
+
+
+@pytest.mark.parametrize("username", ["", ".", "..", "a/b"])
+def test_archive_delete_stays_inside_user_directory(user_manager, tmp_path, username):
+    user_manager.register_user("anna", "password", "user")
+    add_purchases(user_manager, "anna", [f"2026-01-0{i + 1}T10:00:00" for i in range(3)])
+    user_manager.register_user(username, "password", "user")
+    add_purchases(user_manager, username, [f"2026-01-0{i + 1}T10:00:00" for i in range(3)])
+    user_manager.save_data()
+
+    user_manager.delete_user(username)
+
+    assert os.path.exists(tmp_path / "users.json")
+    assert names(user_manager.get_users()["anna"]) == ["item0", "item1", "item2"]
+    assert len(os.listdir(tmp_path / "archive")) == 1
+
+
+class CountingStream(io.StringIO):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def test_console_output_buffers_until_flush():
+    stream = CountingStream()
+    output = ConsoleOutput(stream)
+
+    output.line("header")
+    output.row("products", {"name": "milk", "price": 10.0}, "{name}: {price:.2f}")
+    output.row("recommendations", ["tea"], lambda names: ", ".join(names))
+    output.message("done")
+    assert stream.getvalue() == ""
+
+    output.flush()
+    output.flush()
+    assert stream.getvalue() == "header\nmilk: 10.00\ntea\ndone\n"
+    assert stream.writes == 1
+
+
+@pytest.mark.parametrize("sink", [NullOutput(), StructuredOutput()])
+def test_data_sinks_never_format_rows(sink):
+    def fail(data):
+        raise AssertionError("row was formatted")
+
+    sink.row("products", {"name": "milk"}, fail)
+
+
+def test_mutating_operation_writes_once(tmp_path):
+    stream = CountingStream()
+    product_manager = ProductManager(data_file=str(tmp_path / "products.json"), output=ConsoleOutput(stream))
+    stream.writes = 0
+
+    product_manager.add_product("milk", 10.0, 5)
+
+    assert stream.writes == 1
+    assert stream.getvalue().endswith("Данные о товарах сохранены.\nТовар добавлен!\n")
+
+
+def test_null_output_prints_nothing(tmp_path, capsys):
+    output = NullOutput()
+    product_manager = ProductManager(data_file=str(tmp_path / "products.json"), output=output)
+    product_manager.add_product("milk", 10.0, 5)
+    product_manager.show_products()
+    customer = Customer("anna", "password")
+    customer.set_output(output)
+    customer.add_to_cart(product_manager.get_products()[0], product_manager)
+    customer.view_cart()
+    customer.view_recommendations(["bread"])
+
+    assert capsys.readouterr().out == ""
+
+
+def test_structured_output_records_rows(user_manager, output, tmp_path):
+    product_manager = ProductManager(data_file=str(tmp_path / "products.json"), output=output)
+    product_manager.add_product("milk", 10.0, 0)
+    user_manager.register_user("anna", "password", "user")
+    customer = user_manager.get_users()["anna"]
+    customer.add_to_history([Product("bread", 20.0, 1, "2026-01-01T10:00:00")])
+    output.clear()
+
+    product_manager.show_products()
+    product_manager.edit_product(0, None, "-5", None)
+    customer.add_to_cart(product_manager.get_products()[0], product_manager)
+    customer.view_purchase_history()
+    customer.view_recommendations(["butter"])
+    user_manager.show_statistics()
+
+    assert output.get_rows("products") == [{"number": 1, "name": "milk", "price": 10.0, "quantity": 0}]
+    assert output.get_rows("history") == [
+        {"number": 1, "name": "bread", "price": 20.0, "purchase_date": "2026-01-01T10:00:00"}
+    ]
+    assert output.get_rows("recommendations") == [["butter"]]
+    assert output.get_rows("statistics") == [
+        {"total_purchases": 1, "total_revenue": 20.0, "average_purchase_value": 20.0}
+    ]
+    assert "Цена должна быть больше 0." in output.get_messages()
+    assert "Товар отсутствует на складе." in output.get_messages()